@@ -1,4 +1,15 @@
+import itertools
+import math
+import multiprocessing
+import operator
 import random
+import secrets
+from typing import Iterable, Iterator
+
+try:
+    import gmpy2
+except ImportError:  # Fall back to the pure Python primality test
+    gmpy2 = None
 
 """
 List of characters to be used for BearcatII system.
@@ -32,6 +43,53 @@ characters = [
     "Z",
 ]
 
+"""
+Lookup tables between characters and their indexes in the BearcatII system.
+"""
+_char_to_index = {char: index + 1 for index, char in enumerate(characters)}
+_index_to_char = {index + 1: char for index, char in enumerate(characters)}
+
+"""
+Base in which BearcatII indexes are packed into a single number. Index 0 is
+unused so every character is a non-zero digit.
+"""
+BASE = len(characters) + 1
+
+"""
+Translation tables between characters and the code points chr(index) of their
+indexes in the BearcatII system.
+"""
+_encode_table = str.maketrans({c: chr(i) for i, c in _index_to_char.items()})
+_decode_table = str.maketrans({chr(i): c for i, c in _index_to_char.items()})
+
+"""
+Translation table between characters and the digit int() reads for their
+indexes in the BearcatII system, valid for bases from BASE up to 36.
+"""
+_digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+_digit_table = str.maketrans({c: _digits[i] for i, c in _index_to_char.items()})
+
+"""
+List of primes below 1000 used for trial division before Miller-Rabin.
+"""
+SMALL_PRIMES = [
+    p for p in range(2, 1000) if all(p % d for d in range(2, math.isqrt(p) + 1))
+]
+
+"""
+Miller-Rabin bases that decide primality deterministically for every n below
+MILLER_RABIN_DETERMINISTIC_LIMIT.
+"""
+MILLER_RABIN_WITNESSES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+MILLER_RABIN_DETERMINISTIC_LIMIT = 318665857834031151167461
+
+"""
+Number of digits from which generate_n_digit_prime searches with
+sieve_candidates. Below it, sieving a window costs more than trial dividing
+fresh random candidates.
+"""
+SIEVE_MIN_DIGITS = 30
+
 
 def get_character_from_index(index: int) -> str:
     """
@@ -47,11 +105,11 @@ def get_character_from_index(index: int) -> str:
         IndexError: If the index is out of the range of the BearcatII system.
     """
 
-    if index > len(characters):
+    try:
+        return _index_to_char[index]
+    except KeyError:
         raise IndexError("Index out of range of BearcatII system.")
 
-    return characters[index - 1]
-
 
 def get_index_from_character(character: str) -> int:
     """
@@ -67,27 +125,10 @@ def get_index_from_character(character: str) -> int:
         Exception: If the character does not exist in the BearcatII system.
     """
 
-    for index in range(len(characters)):
-        if characters[index] == character:
-            return index + 1
-
-    raise Exception("Character not found")
-
-
-def get_random_int_between(a: int, b: int) -> int:
-    """
-    Generates a random integer between a and b (inclusive).
-
-    Args:
-        a (int): The lower range of the random integer.
-        b (int): The upper range of the random integer.
-
-    Returns:
-        int: An integer between a and b (inclusive).
-
-    """
-
-    return random.randint(a, b)
+    try:
+        return _char_to_index[character]
+    except KeyError:
+        raise Exception("Character not found")
 
 
 def euclid_gcd(a: int, b: int) -> int:
@@ -102,10 +143,7 @@ def euclid_gcd(a: int, b: int) -> int:
         int: The GCD of a and b.
     """
 
-    if b == 0:
-        return a
-
-    return euclid_gcd(b, a % b)
+    return math.gcd(a, b)
 
 
 def extended_euclid_gcd(a: int, b: int) -> tuple[int, int, int]:
@@ -121,14 +159,18 @@ def extended_euclid_gcd(a: int, b: int) -> tuple[int, int, int]:
         tuple[int, int, int]: A tuple with values GCD of a and b, s and t.
     """
 
-    if b == 0:
-        return (a, 1, 0)
+    (old_r, r) = (a, b)
+    (old_s, s) = (1, 0)
+    (old_t, t) = (0, 1)
 
-    (g, s, t) = extended_euclid_gcd(b, a % b)
+    while r:
+        q = old_r // r
 
-    q = a // b
+        (old_r, r) = (r, old_r - q * r)
+        (old_s, s) = (s, old_s - q * s)
+        (old_t, t) = (t, old_t - q * t)
 
-    return (g, t, s - q * t)
+    return (old_r, old_s, old_t)
 
 
 def powers(a: int, n: int, k: int) -> int:  # Modular Exponentiation
@@ -147,24 +189,70 @@ def powers(a: int, n: int, k: int) -> int:  # Modular Exponentiation
         ValueError: If the inverse of a and k does not exist.
     """
 
-    if n == 0:
-        return 1 % k
+    return pow(a, n, k)
 
-    if n == 1:
-        return a % k
 
-    if n < 0:
-        (g, s, _) = extended_euclid_gcd(a, k)
+def miller_rabin(n: int, witnesses: Iterable[int]) -> bool:
+    """
+    Checks the primality of the number n against the given Miller-Rabin bases
+    after trial division by the small primes.
 
-        if g != 1:
-            raise ValueError("Inverse does not exist.")
+    Args:
+        n (int): The number which is to be tested for primality.
+        witnesses (Iterable[int]): The bases to test n against. It is only
+            consumed if n has no small prime factor.
 
-        return powers(s % k, -n, k)
+    Returns:
+        bool: Returns True if n is a strong probable prime to every base else
+            returns False.
+    """
 
-    if n % 2 == 0:
-        return powers((a * a) % k, int(n // 2), k)
+    if n < 2:
+        return False
 
-    return (a * powers((a * a) % k, int((n - 1) // 2), k)) % k
+    for p in SMALL_PRIMES:  # Trial division
+        if n % p == 0:
+            return n == p
+
+    if n < SMALL_PRIMES[-1] ** 2:
+        return True
+
+    return strong_probable_prime(n, witnesses)
+
+
+def strong_probable_prime(n: int, witnesses: Iterable[int]) -> bool:
+    """
+    Checks the odd number n against the given Miller-Rabin bases without any
+    trial division.
+
+    Args:
+        n (int): The odd number which is to be tested for primality.
+        witnesses (Iterable[int]): The bases to test n against.
+
+    Returns:
+        bool: Returns True if n is a strong probable prime to every base else
+            returns False.
+    """
+
+    minus_one = n - 1
+    s = (minus_one & -minus_one).bit_length() - 1  # n - 1 = d * 2^s
+    d = minus_one >> s
+
+    for a in witnesses:
+        x = powers(a, d, n)
+
+        if x == 1 or x == minus_one:
+            continue
+
+        for _ in range(s - 1):
+            x = (x * x) % n
+
+            if x == minus_one:
+                break
+        else:
+            return False
+
+    return True
 
 
 def prime_test_miller_rabin(n: int, iterations: int) -> bool:
@@ -180,52 +268,148 @@ def prime_test_miller_rabin(n: int, iterations: int) -> bool:
         bool: Returns True if n is prime else returns False.
     """
 
-    for _ in range(iterations):
-        k = n - 1
+    if gmpy2 is not None:
+        return gmpy2.is_prime(n, iterations)
 
-        a = get_random_int_between(2, n - 2)
+    randint = random.randint
 
-        if powers(a, k, n) != 1:  # Fermat's Little Theorem
-            return False
+    return miller_rabin(n, (randint(2, n - 2) for _ in range(iterations)))
 
-        while (k % 2) == 0:
-            k = k // 2
 
-            x = powers(a, k, n)
+def deterministic_miller_rabin(n: int) -> bool:
+    """
+    Checks the primality of the number n using the fixed Miller-Rabin bases,
+    which give an exact answer below MILLER_RABIN_DETERMINISTIC_LIMIT. Larger
+    numbers fall back to the probabilistic test.
 
-            if x == n - 1:
-                break
+    Args:
+        n (int): The number which is to be tested for primality.
 
-            if x != 1:
-                return False
+    Returns:
+        bool: Returns True if n is prime else returns False.
+    """
 
-    return True
+    if n >= MILLER_RABIN_DETERMINISTIC_LIMIT:
+        return prime_test_miller_rabin(n, 10)
 
+    return miller_rabin(n, MILLER_RABIN_WITNESSES)
 
-def generate_n_digit_prime(n: int) -> int:
+
+def sieved_miller_rabin(n: int) -> bool:
+    """
+    Checks the primality of a number from sieve_candidates, which is known to
+    have no small prime factor, so the trial division is skipped.
+
+    Args:
+        n (int): The number which is to be tested for primality.
+
+    Returns:
+        bool: Returns True if n is prime else returns False.
+    """
+
+    if n < SMALL_PRIMES[-1] ** 2:
+        return n > 1
+
+    if n >= MILLER_RABIN_DETERMINISTIC_LIMIT:
+        randint = random.randint
+
+        return strong_probable_prime(n, (randint(2, n - 2) for _ in range(10)))
+
+    return strong_probable_prime(n, MILLER_RABIN_WITNESSES)
+
+
+def sieve_candidates(start: int, stop: int) -> Iterator[int]:
+    """
+    Generates the odd numbers from start up to stop that have no factor among
+    the small primes. The numbers are sieved a window at a time, so each small
+    prime costs one modular reduction per window instead of one per number.
+
+    Args:
+        start (int): The odd number to start the search from.
+        stop (int): The upper limit of the search (exclusive).
+
+    Returns:
+        Iterator[int]: The odd numbers in [start, stop) without small prime
+            factors, in increasing order.
+    """
+
+    WINDOW = 128  # Number of odd numbers sieved at a time
+
+    while start < stop:
+        sieve = bytearray(b"\x01") * WINDOW
+
+        for p in SMALL_PRIMES[1:]:
+            i = (-start * ((p + 1) // 2)) % p  # start + 2 * i = 0 (mod p)
+
+            if start + 2 * i == p:  # Keep the small prime itself
+                i += p
+
+            sieve[i::p] = bytes(len(range(i, WINDOW, p)))
+
+        end = min(start + 2 * WINDOW, stop)
+
+        yield from itertools.compress(range(start, end, 2), sieve)
+
+        start += 2 * WINDOW
+
+
+def generate_n_digit_prime(n: int, processes: int = 1) -> int:
     """
     Generates an n digit prime number based on Miller-Rabin Primality Test.
 
     Args:
         n (int): The number of digits to be generated.
+        processes (int): The number of worker processes testing candidates in
+            parallel. Starting the workers costs far more than a 20 digit
+            search, so this only pays off for large n. Ignored when gmpy2 is
+            installed, which searches with GMP's next_prime instead.
 
     Returns:
         int: Returns an n digit prime number.
     """
 
-    while True:
-        first_digit = str(get_random_int_between(1, 9))
+    low = 10 ** (n - 1)
+    high = 10**n
+    odd_low = low | 1
+    odd_count = (high - odd_low + 1) // 2
+    randbelow = secrets.randbelow
+
+    if gmpy2 is not None:
+        while True:
+            prime = int(gmpy2.next_prime(low + randbelow(high - low)))
+
+            if prime < high:
+                return prime
 
-        middle_digits = "".join(
-            str(get_random_int_between(0, 9)) for _ in range(n - 2)
-        )
+    starts = iter(lambda: odd_low + 2 * randbelow(odd_count), None)
 
-        last_digit = random.choice([1, 3, 7, 9])
+    if n < SIEVE_MIN_DIGITS:
+        candidates: Iterator[int] = (
+            prime for prime in starts if prime % 5 != 0
+        )  # Fresh odd n digit candidates not divisible by 5
+        test = deterministic_miller_rabin
+    else:
+        candidates = itertools.chain.from_iterable(
+            sieve_candidates(start, high) for start in starts
+        )  # Search upwards from a random odd start, restarting past n digits
+        test = sieved_miller_rabin
 
-        prime = int(f"{first_digit}{middle_digits}{last_digit}")
+    if processes <= 1:
+        for prime in candidates:
+            if test(prime):
+                return prime
 
-        if prime_test_miller_rabin(prime, 10):
-            return prime
+    CHUNK_SIZE = 32
+
+    with multiprocessing.Pool(processes) as pool:
+        while True:
+            batch = list(itertools.islice(candidates, processes * CHUNK_SIZE))
+
+            results = pool.imap(test, batch, CHUNK_SIZE)
+
+            for prime, is_prime in zip(batch, results):
+                if is_prime:
+                    return prime
 
 
 def convert_to_bearcatii(message: str) -> list[int]:
@@ -239,9 +423,15 @@ def convert_to_bearcatii(message: str) -> list[int]:
     Returns:
         list[int]: Returns a list of BearcatII indexes corresponding to the
             characters in the message.
+
+    Raises:
+        Exception: If a character does not exist in the BearcatII system.
     """
 
-    return [get_index_from_character(char) for char in message]
+    if not _char_to_index.keys() >= set(message):
+        raise Exception("Character not found")
+
+    return list(message.translate(_encode_table).encode("latin-1"))
 
 
 def convert_bearcatii_to_string(bearcatii: list[int]) -> str:
@@ -254,9 +444,15 @@ def convert_bearcatii_to_string(bearcatii: list[int]) -> str:
 
     Returns:
         str: Returns a corresponding string from the list of BearcatII indexes.
+
+    Raises:
+        IndexError: If an index is out of the range of the BearcatII system.
     """
 
-    return "".join([get_character_from_index(index) for index in bearcatii])
+    if not _index_to_char.keys() >= set(bearcatii):
+        raise IndexError("Index out of range of BearcatII system.")
+
+    return bytes(bearcatii).decode("latin-1").translate(_decode_table)
 
 
 def convert_to_base_n(value: int, n: int) -> list[int]:
@@ -273,10 +469,13 @@ def convert_to_base_n(value: int, n: int) -> list[int]:
     """
 
     output: list[int] = []
+    append = output.append
 
     while value:
-        output.insert(0, value % n)
-        value = value // n
+        (value, digit) = divmod(value, n)
+        append(digit)
+
+    output.reverse()
 
     return output
 
@@ -302,6 +501,125 @@ def horner_eval(coefficients: list[int], value: int) -> int:
     return output
 
 
+def message_to_int(message: str, base: int) -> int:
+    """
+    Converts a message to the number whose base-n digits are the BearcatII
+    indexes of its characters, without building the list of indexes. For bases
+    that int() can parse the digits are converted in C.
+
+    Args:
+        message (str): The message to be converted.
+        base (int): The base in which the indexes are the digits.
+
+    Returns:
+        int: The number represented by the message.
+
+    Raises:
+        Exception: If a character does not exist in the BearcatII system.
+    """
+
+    if not _char_to_index.keys() >= set(message):
+        raise Exception("Character not found")
+
+    if BASE <= base <= len(_digits):
+        try:
+            return int(message.translate(_digit_table) or "0", base)
+        except ValueError:  # Longer than the interpreter's int() digit limit
+            pass
+
+    output = 0
+    lookup = _char_to_index
+
+    for char in message:
+        output = output * base + lookup[char]
+
+    return output
+
+
+def precompute_base_powers(base: int, length: int, k: int) -> list[int]:
+    """
+    Calculates the values (base ^ i) mod k for every digit position of a
+    message with the given length, so that many messages of that length can be
+    converted with message_to_int_mod under the same key.
+
+    Args:
+        base (int): The base in which the indexes are the digits.
+        length (int): The number of characters in each message.
+        k (int): The value for modulation.
+
+    Returns:
+        list[int]: The values (base ^ i) mod k in decreasing order of i.
+    """
+
+    output: list[int] = []
+    power = 1 % k
+
+    for _ in range(length):
+        output.append(power)
+        power = (power * base) % k
+
+    output.reverse()
+
+    return output
+
+
+def message_to_int_mod(message: str, base_powers: list[int], k: int) -> int:
+    """
+    Converts a message to the value of message_to_int mod k as a sum of
+    independent products, using the powers from precompute_base_powers.
+
+    Args:
+        message (str): The message to be converted.
+        base_powers (list[int]): The precomputed powers of the base for
+            messages of this length.
+        k (int): The value for modulation.
+
+    Returns:
+        int: The number represented by the message mod k.
+
+    Raises:
+        ValueError: If the message length does not match the powers.
+        Exception: If a character does not exist in the BearcatII system.
+    """
+
+    if len(message) != len(base_powers):
+        raise ValueError("Message length does not match the base powers.")
+
+    digits = convert_to_bearcatii(message)
+
+    return sum(map(operator.mul, digits, base_powers)) % k
+
+
+def int_to_message(value: int, base: int) -> str:
+    """
+    Converts a number back to the message whose BearcatII indexes are its
+    base-n digits, without building the list of indexes.
+
+    Args:
+        value (int): The number to be converted.
+        base (int): The base in which the indexes are the digits.
+
+    Returns:
+        str: The message represented by the number.
+
+    Raises:
+        IndexError: If a digit is out of the range of the BearcatII system.
+    """
+
+    output = bytearray()
+
+    while value:
+        (value, digit) = divmod(value, base)
+        output.append(digit)
+
+    if not _index_to_char.keys() >= set(output):
+        raise IndexError("Index out of range of BearcatII system.")
+
+    output.reverse()
+
+    return output.decode("latin-1").translate(_decode_table)
+
+
 def euler_totient(p: int, q: int) -> int:
     """
     Calculates the value for euler totient of n based of two primes p and q
@@ -334,24 +652,27 @@ def rsa() -> None:
     while True:
         e = int(input("Enter the value for public key: "))
 
-        if euclid_gcd(e, phi) == 1:
+        try:
+            private_key = powers(e, -1, phi)
             break
+        except ValueError:
+            print(
+                "The value is not relatively prime to the euler totient value."
+            )
 
-        print("The value is not relatively prime to the euler totient value.")
+    while True:
+        message = input("Enter the message to encrypt: ")
+        bearcatii_to_decimal = message_to_int(message, BASE)
 
-    message = input("Enter the message to encrypt: ")
-    message_to_bearcatii = convert_to_bearcatii(message)
-    bearcatii_to_decimal = horner_eval(
-        message_to_bearcatii, len(characters) + 1
-    )
+        if bearcatii_to_decimal < n:
+            break
 
-    C = powers(bearcatii_to_decimal, e, n)
+        print("The message is too long to encrypt with the value of n.")
 
-    (_, private_key, _) = extended_euclid_gcd(e, phi)
+    C = powers(bearcatii_to_decimal, e, n)
 
     decrypted = powers(C, private_key, n)
-    decrypted_to_bearcatii = convert_to_base_n(decrypted, len(characters) + 1)
-    decrypted_message = convert_bearcatii_to_string(decrypted_to_bearcatii)
+    decrypted_message = int_to_message(decrypted, BASE)
 
     print("p:", p)
     print("q:", q)
@@ -361,4 +682,5 @@ def rsa() -> None:
     print("P:", decrypted_message)
 
 
-rsa()
+if __name__ == "__main__":
+    rsa()